@@ -1,11 +1,11 @@
 import streamlit as st
 import hashlib
 import requests
-import io
-import csv
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 from datetime import datetime, timezone
-from statistics import mean
 
 # --- Configuration & Helpers (from all 3 scripts) ---
 
@@ -17,6 +17,8 @@ API_DEFAULT = "https://script.google.com/macros/s/AKfycbyNZNOE1DYNbd4GbGTISJsGrn
 # Parameters from merge_consensus.py
 K_FACTOR = 2/3
 ALLOWED_MIN, ALLOWED_MAX = 0, 100
+# Sentinel for unparseable timestamps (sorts before every real timestamp)
+TS_MIN = pd.Timestamp.min.tz_localize("UTC")
 
 # --- Helper Functions (from clients & merge scripts) ---
 
@@ -28,181 +30,182 @@ def now_utc():
     """Returns the current time in UTC."""
     return datetime.now(timezone.utc)
 
-def parse_ts(ts):
-    """Parses an ISO timestamp string (robust to 'Z' suffix)."""
-    try:
-        # Handle Google Sheet's 'Z' suffix for UTC
-        return datetime.fromisoformat(ts.replace("Z", "+00:00"))
-    except Exception:
-        return None
-
-@st.cache_data(ttl=60) # Cache API data for 60 seconds
-def get_csv(url):
-    """Fetches and parses a CSV from a URL."""
-    try:
-        r = requests.get(url, timeout=20)
+def _clean_table(df, columns):
+    """Returns the given string columns of df, stripped (missing columns become "")."""
+    df = df.reindex(columns=columns, fill_value="")
+    return df.apply(lambda col: col.str.strip())
+
+def parse_ts_column(col):
+    """Parses a column of ISO timestamps (robust to 'Z' suffix) to int64
+    nanoseconds since the epoch, UTC; unparseable values become TS_MIN."""
+    # Handle Google Sheet's 'Z' suffix for UTC
+    parsed = pd.to_datetime(
+        col.str.replace("Z", "+00:00", regex=False),
+        utc=True, errors="coerce", format="ISO8601",
+    )
+    # Plain integers make every comparison in the join a single int compare
+    return parsed.fillna(TS_MIN).dt.as_unit("ns").astype("int64")
+
+@st.cache_resource
+def _session():
+    """Returns one pooled HTTP session shared by every rerun, so the TLS
+    connection to the API is reused across fetches and submissions."""
+    s = requests.Session()
+    s.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    return s
+
+def get_csv(http, url):
+    """Fetches and parses a CSV from a URL into a DataFrame of strings.
+
+    Runs on worker threads, so it raises instead of calling st.error.
+    """
+    with http.get(url, timeout=20, stream=True) as r:
         r.raise_for_status()
-        # Use io.StringIO to treat the text as a file
-        csv_data = list(csv.DictReader(io.StringIO(r.text)))
-        return csv_data
-    except Exception as e:
-        st.error("Failed to fetch data from {}: {}".format(url, e))
-        return None
+        # Parse straight from the socket (gzip undone by urllib3) instead of
+        # materialising r.text; keep every cell as a string, "" rather than NaN
+        r.raw.decode_content = True
+        try:
+            return pd.read_csv(r.raw, dtype=str, keep_default_na=False, encoding="utf-8")
+        except pd.errors.EmptyDataError:
+            # Empty body (no header either): an empty table, which _clean_table
+            # fills out with the expected columns
+            return pd.DataFrame()
 
 # --- Core Consensus Logic (from merge_consensus.py) ---
 
+@st.cache_data(ttl=60, show_spinner=False, max_entries=16) # Cache API data for 60 seconds
 def run_consensus(base):
     """
     Fetches all commits and reveals, runs the consensus algorithm,
     and returns the results for display in Streamlit.
+
+    Cached per API URL, so re-clicking "Lancer le Consensus" inside the TTL
+    skips parsing, matching and hashing entirely. A failed fetch raises, so
+    the error is never cached; the caller reports it.
     """
     commits_url = "{}?table=commits".format(base)
     reveals_url = "{}?table=reveals".format(base)
 
-    commits_raw = get_csv(commits_url)
-    reveals_raw = get_csv(reveals_url)
-
-    if commits_raw is None or reveals_raw is None:
-        return None, None, None  # Error state
-
-    # 1. Parse commits into a dict by uni_id
-    commits = {}
-    for r in commits_raw:
-        uid = (r.get("uni_id") or "").strip()
-        ch = (r.get("commit") or "").strip()
-        ts = (r.get("timestamp_utc") or "").strip()
-        if not uid or not ch or not ts:
-            continue
-        commits.setdefault(uid, []).append({
-            "timestamp_utc": ts,
-            "ts_parsed": parse_ts(ts),
-            "uni_id": uid,
-            "commit": ch
-        })
-
-    # 2. Parse reveals into a dict by uni_id
-    reveals = {}
-    for r in reveals_raw:
-        uid = (r.get("uni_id") or "").strip()
-        num = (r.get("number") or "").strip()
-        nonce = (r.get("nonce") or "").strip()
-        ts = (r.get("timestamp_utc") or "").strip()
-        if not uid or not num or not ts: # Nonce can be empty, but not uid/num/ts
-            continue
-        reveals.setdefault(uid, []).append({
-            "timestamp_utc": ts,
-            "ts_parsed": parse_ts(ts),
-            "uni_id": uid,
-            "number_raw": num,
-            "nonce": nonce
-        })
-
-    verified_rows = []
-    matched_commits = {}
-
-    # 3. Run matching logic for each student
-    for uid, rlist in reveals.items():
-        # Rule: take the LATEST reveal
-        rlist_sorted = sorted(rlist, key=lambda x: (x["ts_parsed"] or datetime.min))
-        latest_rev = rlist_sorted[-1]
-        ts_rev = latest_rev["ts_parsed"] or datetime.min
-
-        # Parse number
+    # Both tables come from the same host: fetch them concurrently
+    http = _session()
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        pending = [(url, ex.submit(get_csv, http, url)) for url in (commits_url, reveals_url)]
+    tables = []
+    for url, fut in pending:
         try:
-            num = int(latest_rev["number_raw"])
-        except Exception:
-            num = None
-
-        # Rule: take the LATEST commit whose timestamp <= that reveal
-        cands = []
-        for c in commits.get(uid, []):
-            ts_c = c["ts_parsed"] or datetime.min
-            if ts_c <= ts_rev:
-                cands.append(c)
-        
-        chosen_commit = None
-        if cands:
-            cands.sort(key=lambda x: (x["ts_parsed"] or datetime.min))
-            chosen_commit = cands[-1]
-            matched_commits[uid] = chosen_commit # For debug/output
-
-        # 4. Verify the reveal against the commit
-        reason = "ok"
-        verified = False
-        preimage_hash = ""
-        
-        if chosen_commit is None:
-            reason = "no_commit_before_reveal"
-        elif num is None:
-            reason = "number_not_int"
-        elif not (ALLOWED_MIN <= num <= ALLOWED_MAX):
-            reason = "out_of_range"
-        else:
-            preimage = "{}|{}|{}".format(uid, num, latest_rev['nonce'])
-            preimage_hash = sha256(preimage)
-            verified = (preimage_hash == chosen_commit["commit"])
-            if not verified:
-                reason = "hash_mismatch"
-
-        # Add to leaderboard data
-        verified_rows.append({
-            "uni_id": uid,
-            "timestamp_utc": latest_rev["timestamp_utc"],
-            "number": "" if num is None else str(num),
-            "nonce": latest_rev["nonce"],
-            "commit": chosen_commit["commit"] if chosen_commit else "",
-            "preimage_hash": preimage_hash,
-            "verified": "True" if verified else "False",
-            "reason": reason
-        })
-
-    # 5. Calculate winners from verified reveals
-    valid = [(r["uni_id"], int(r["number"])) for r in verified_rows
-             if r["verified"] == "True" and r["number"] != ""]
-    
+            tables.append(fut.result())
+        except Exception as e:
+            raise RuntimeError("Failed to fetch data from {}: {}".format(url, e)) from e
+    commits_raw, reveals_raw = tables
+
+    # 1. Parse commits into a frame (one row per commit)
+    commits_df = _clean_table(commits_raw, ["uni_id", "commit", "timestamp_utc"])
+    commits_df = commits_df[
+        (commits_df[["uni_id", "commit", "timestamp_utc"]] != "").all(axis=1)
+    ]
+    commits_df = commits_df.assign(
+        ts_ns=parse_ts_column(commits_df["timestamp_utc"])
+    )
+
+    # 2. Parse reveals into a frame (one row per reveal)
+    reveals_df = _clean_table(reveals_raw, ["uni_id", "number", "nonce", "timestamp_utc"])
+    # Nonce can be empty, but not uid/num/ts
+    reveals_df = reveals_df[
+        (reveals_df[["uni_id", "number", "timestamp_utc"]] != "").all(axis=1)
+    ]
+    reveals_df = reveals_df.rename(columns={"number": "number_raw"}).assign(
+        ts_ns=parse_ts_column(reveals_df["timestamp_utc"])
+    )
+
+    # 3. Match each student's LATEST reveal with the LATEST commit whose
+    #    timestamp <= that reveal (merge_asof requires both sides sorted on the key)
+    # idxmax keeps the first maximum, so scan in reverse: the last row still
+    # wins on equal timestamps. Only the per-uid winners need sorting.
+    latest_idx = reveals_df.iloc[::-1].groupby("uni_id", sort=False)["ts_ns"].idxmax()
+    reveals_latest = reveals_df.loc[latest_idx].sort_values("ts_ns", kind="stable")
+    # Only the join key columns and the commit hash travel through the merge
+    commit_cols = commits_df[["uni_id", "ts_ns", "commit"]]
+    matched = pd.merge_asof(
+        reveals_latest,
+        commit_cols.sort_values("ts_ns", kind="stable"),
+        on="ts_ns",
+        by="uni_id",
+        direction="backward",
+    )
+    matched["commit"] = matched["commit"].fillna("")
+
+    # 4. Verify each reveal against its commit (whole columns at once)
+    is_int = matched["number_raw"].str.fullmatch(r"[+-]?\d+").fillna(False).astype(bool)
+    num_f = pd.to_numeric(matched["number_raw"].where(is_int), errors="coerce")
+    num_bad = num_f.isna().to_numpy()
+    # Range check on the float result, before the Int64 cast: literals too big
+    # for int64 (anyone can post one) are out_of_range instead of raising
+    in_range = num_f.between(ALLOWED_MIN, ALLOWED_MAX).to_numpy(dtype=bool)
+    out_of_range = ~(num_bad | in_range)
+    num = num_f.where(in_range).astype("Int64")
+    number = num.astype("string").fillna("")
+    # Out-of-range literals keep their exact value, as str(int(...)) printed them
+    number[out_of_range] = [str(int(s)) for s in matched["number_raw"].to_numpy()[out_of_range]]
+    matched["number"] = number
+
+    no_commit = (matched["commit"] == "").to_numpy()
+    checkable = ~(no_commit | num_bad | out_of_range)
+
+    # Only rows that passed the earlier checks can reach the hash comparison
+    pre = matched["uni_id"].str.cat([matched["number"], matched["nonce"]], sep="|")
+    preimages = [s.encode("utf-8") for s in pre.to_numpy()[checkable]]
+    preimage_hash = np.full(len(matched), "", dtype=object)
+    sha = hashlib.sha256  # local name: no attribute lookup per row
+    preimage_hash[checkable] = [sha(b).hexdigest() for b in preimages]
+    matched["preimage_hash"] = preimage_hash
+    mismatch = matched["preimage_hash"].to_numpy() != matched["commit"].to_numpy()
+
+    matched["reason"] = np.select(
+        [no_commit, num_bad, out_of_range, mismatch],
+        ["no_commit_before_reveal", "number_not_int", "out_of_range", "hash_mismatch"],
+        default="ok",
+    )
+    matched["verified"] = matched["reason"] == "ok"
+
+    # 5. Calculate winners from verified reveals (verified implies a valid number)
+    ok = matched["verified"].to_numpy(dtype=bool)
+    uids = matched["uni_id"].to_numpy(dtype=object)[ok]
+    nums = num.to_numpy(dtype=np.int32, na_value=0)[ok]
+
     avg_val = target = min_dist = None
     winners = []
-    
-    if valid:
-        avg_val = mean(n for _, n in valid)
+
+    if nums.size:
+        avg_val = float(nums.mean())
         target = K_FACTOR * avg_val
-        distances = [(uid, n, abs(n - target)) for uid, n in valid]
-        min_dist = min(d for _, _, d in distances)
-        # Handle ties by checking for near-zero difference
-        winners = [(uid, n, d) for uid, n, d in distances if abs(d - min_dist) < 1e-12]
+        dists = np.abs(nums - target)
+        min_dist = float(dists.min())
+        # Handle ties by checking for near-zero difference: one masked gather
+        win_mask = np.abs(dists - min_dist) < 1e-12
+        winners = sorted(zip(uids[win_mask].tolist(), nums[win_mask].tolist(), dists[win_mask].tolist()))
 
     # 6. Prepare outputs for Streamlit
-    
-    # Leaderboard DataFrame
-    leaderboard_data = []
-    for r in verified_rows:
-        dist = None
-        if r["verified"] == "True" and r["number"] != "" and target is not None:
-            try:
-                dist = abs(int(r['number']) - target)
-            except ValueError:
-                dist = None # Should not happen if verified
-        r["distance"] = dist
-        leaderboard_data.append(r)
-        
-    leaderboard_df = pd.DataFrame(leaderboard_data)
-    # Re-order columns for clarity
-    cols = ["uni_id", "number", "verified", "reason", "distance", "commit", "nonce", "timestamp_utc"]
-    # Ensure all columns exist before reindexing
-    for c in cols:
-        if c not in leaderboard_df.columns:
-            leaderboard_df[c] = None
-            
-    leaderboard_df = leaderboard_df.reindex(columns=cols)
-    leaderboard_df = leaderboard_df.sort_values(
-        by=["verified", "distance", "uni_id"],
-        ascending=[False, True, True]
-    )
+
+    # Leaderboard DataFrame, built once from the matched frame; distance only
+    # for verified rows (NaN elsewhere)
+    cols = ["uni_id", "number", "verified", "reason", "commit", "nonce", "timestamp_utc"]
+    leaderboard_df = matched[cols].copy()
+    if target is not None:
+        distance = (num.astype("float64") - target).abs().where(matched["verified"])
+    else:
+        distance = np.nan
+    leaderboard_df.insert(cols.index("reason") + 1, "distance", distance)
+    # Only verified rows are ranked by distance; the rest just go by uni_id
+    is_verified = leaderboard_df["verified"]
+    leaderboard_df = pd.concat([
+        leaderboard_df[is_verified].sort_values(["distance", "uni_id"], kind="stable"),
+        leaderboard_df[~is_verified].sort_values("uni_id", kind="stable"),
+    ])
 
     # Results summary dict
     results_summary = {
         "k_factor": K_FACTOR,
-        "participants": len(valid),
+        "participants": int(nums.size),
         "average": avg_val,
         "target": target,
         "min_distance": min_dist,
@@ -288,7 +291,7 @@ with tab_commit:
                 payload = {"kind": "commit", "uni_id": commit_uni_id, "commit": commit_hash}
                 try:
                     with st.spinner("Soumission au registre..."):
-                        r = requests.post(api_url, json=payload, timeout=15)
+                        r = _session().post(api_url, json=payload, timeout=15)
                     st.info("Réponse du serveur (Status {}):".format(r.status_code))
                     st.json(r.text)
                 except Exception as e:
@@ -327,7 +330,7 @@ with tab_reveal:
                 }
                 try:
                     with st.spinner("Soumission au registre..."):
-                        r = requests.post(api_url, json=payload, timeout=15)
+                        r = _session().post(api_url, json=payload, timeout=15)
                     st.info("Réponse du serveur (Status {}):".format(r.status_code))
                     st.json(r.text)
                 except Exception as e:
@@ -340,16 +343,19 @@ with tab_consensus:
     
     if st.button("Lancer le Consensus"):
         with st.spinner("Récupération des données et exécution du consensus..."):
-            leaderboard, results, raw_data = run_consensus(api_url)
-            
-            if leaderboard is None:
+            try:
+                leaderboard, results, raw_data = run_consensus(api_url)
+            except Exception as e:
+                st.error(str(e))
                 st.error("Échec de l'exécution du consensus. Vérifiez l'URL de l'API.")
             else:
                 st.subheader("Résultats du Jeu")
                 col1, col2, col3 = st.columns(3)
                 col1.metric("Participants (Vérifiés)", results.get("participants", 0))
-                col2.metric("Moyenne de la Classe", "{:.4f}".format(results.get("average", 0)))
-                col3.metric("Cible (2/3 de la Moyenne)", "{:.4f}".format(results.get("target", 0)))
+                # average/target are None when nobody verified
+                avg, target = results.get("average"), results.get("target")
+                col2.metric("Moyenne de la Classe", "—" if avg is None else "{:.4f}".format(avg))
+                col3.metric("Cible (2/3 de la Moyenne)", "—" if target is None else "{:.4f}".format(target))
                 
                 st.subheader("🏆 Gagnant(s) 🏆")
                 winners = results.get("winners", [])
@@ -363,4 +369,7 @@ with tab_consensus:
                 st.dataframe(leaderboard, use_container_width=True)
                 
                 with st.expander("Voir les données brutes du registre (JSON)"):
-                    st.json({"commits": raw_data[0], "reveals": raw_data[1]})
\ No newline at end of file
+                    st.json({
+                        "commits": raw_data[0].to_dict("records"),
+                        "reveals": raw_data[1].to_dict("records"),
+                    })
\ No newline at end of file
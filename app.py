@@ -6,37 +6,95 @@ Run with: streamlit run app.py
 import streamlit as st
 import hashlib
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import csv
 import io
+import numpy as np
+import pandas as pd
 from datetime import datetime, timezone
-from statistics import mean
 
 # Configuration
 API_DEFAULT = "https://script.google.com/macros/s/AKfycbyNZNOE1DYNbd4GbGTISJsGrnJ4PYCuip0yjSw3Lr8KkD6-kadKI9mfpKNfiAHEWb0Osw/exec"
 COMMIT_DEADLINE_UTC = datetime(2025, 10, 21, 21, 59, 59, tzinfo=timezone.utc)
 REVEAL_OPEN_UTC = datetime(2025, 10, 21, 22, 0, 0, tzinfo=timezone.utc)
+COMMIT_DEADLINE_STR = COMMIT_DEADLINE_UTC.strftime("%Y-%m-%d %H:%M:%S UTC")
+REVEAL_OPEN_STR = REVEAL_OPEN_UTC.strftime("%Y-%m-%d %H:%M:%S UTC")
 K_FACTOR = 2/3
 
 # Helper Functions
+@st.cache_resource
+def _http() -> requests.Session:
+    """Pooled HTTP session shared across reruns and user sessions.
+
+    Streamlit re-executes this script on every interaction, so a module-level
+    Session would be rebuilt (and its keep-alive connections dropped) each time."""
+    s = requests.Session()
+    s.mount("https://", HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504]),
+    ))
+    return s
+
 def sha256(s: str) -> str:
     return hashlib.sha256(s.encode("utf-8")).hexdigest()
 
+def sha256_preimage(uni_id: str, number: int, nonce: str) -> str:
+    """sha256(f"{uni_id}|{number}|{nonce}") without building the str first."""
+    return hashlib.sha256(b"|".join((uni_id.encode("utf-8"), str(number).encode("ascii"), nonce.encode("utf-8")))).hexdigest()
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _preview_hash(uid: str, n: int, nonce: str) -> str:
+    """Reveal-form hash preview; reruns with unchanged inputs skip the hashing."""
+    return sha256_preimage(uid, n, nonce)
+
 def now_utc():
     return datetime.now(timezone.utc)
 
+@st.cache_data(ttl=1, show_spinner=False)
+def _window_state():
+    """Current time, its display string and the commit/reveal window flags.
+
+    Cached for a second so back-to-back reruns share one computation."""
+    t = now_utc()
+    return t, t.strftime("%Y-%m-%d %H:%M:%S"), t <= COMMIT_DEADLINE_UTC, t >= REVEAL_OPEN_UTC
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _get_csv_data_cached(url: str):
+    """Fetch a table as (header, rows), rows being lists indexed like header.
+
+    Raises on failure so an error response is never cached."""
+    r = _http().get(url, timeout=20)
+    r.raise_for_status()
+    if r.encoding is None:
+        r.encoding = "utf-8"
+    # Whole-text parse: quoted fields may contain newlines
+    reader = csv.reader(io.StringIO(r.text))
+    header = next(reader, [])
+    return header, list(reader)
+
 def get_csv_data(url: str):
     try:
-        r = requests.get(url, timeout=20)
-        r.raise_for_status()
-        return list(csv.DictReader(io.StringIO(r.text)))
+        return _get_csv_data_cached(url)
     except Exception as e:
         st.error(f"Error fetching data: {e}")
-        return []
+        return [], []
+
+def table_frame(header, rows):
+    """DataFrame of (header, rows) for display; ragged rows don't raise.
+
+    Short rows are padded and cells past the header land in extra_N columns,
+    as DictReader used to tolerate them."""
+    width = max(len(header), max(map(len, rows), default=0))
+    df = pd.DataFrame(rows).reindex(columns=range(width))
+    df.columns = list(header) + [f"extra_{i}" for i in range(1, width - len(header) + 1)]
+    return df
 
 def send_commit(api_url, uni_id, commit_hash):
     payload = {"kind": "commit", "uni_id": uni_id, "commit": commit_hash}
     try:
-        r = requests.post(api_url, json=payload, timeout=15)
+        r = _http().post(api_url, json=payload, timeout=15)
         return r.status_code, r.text
     except Exception as e:
         return None, str(e)
@@ -44,11 +102,28 @@ def send_commit(api_url, uni_id, commit_hash):
 def send_reveal(api_url, uni_id, number, nonce):
     payload = {"kind": "reveal", "uni_id": uni_id, "number": number, "nonce": nonce}
     try:
-        r = requests.post(api_url, json=payload, timeout=15)
+        r = _http().post(api_url, json=payload, timeout=15)
         return r.status_code, r.text
     except Exception as e:
         return None, str(e)
 
+def _submit_commit_callback(api_url):
+    """Send the commitment stored in session state; runs once per click.
+
+    commit_submitted_hash is the idempotency key: a hash the server already
+    accepted, or one whose POST is still in flight, is not sent again."""
+    last_commit = st.session_state["last_commit"]
+    if st.session_state.get("commit_in_flight") or st.session_state.get("commit_submitted_hash") == last_commit["hash"]:
+        return
+    st.session_state["commit_in_flight"] = True
+    try:
+        status, response = send_commit(api_url, last_commit["uni_id"], last_commit["hash"])
+    finally:
+        st.session_state["commit_in_flight"] = False
+    st.session_state["commit_response"] = (status, response)
+    if status is not None and status < 400:
+        st.session_state["commit_submitted_hash"] = last_commit["hash"]
+
 # Page Configuration
 st.set_page_config(
     page_title="Beauty Contest Game",
@@ -66,23 +141,18 @@ This is a strategic game where you try to guess **2/3 of the average** of all pl
 """)
 
 # Sidebar for API Configuration
-with st.sidebar:
-    st.header("⚙️ Configuration")
-    api_url = st.text_input("API URL", value=API_DEFAULT)
-    
-    st.divider()
-    
-    current_time = now_utc()
+@st.fragment(run_every="1s")
+def _render_timeline():
+    """Sidebar clock and window badges; reruns on its own one-second timer
+    instead of with every widget interaction on the page."""
+    _, current_time_str, commit_open, reveal_open = _window_state()
     st.subheader("⏰ Game Timeline")
     
-    commit_open = current_time <= COMMIT_DEADLINE_UTC
-    reveal_open = current_time >= REVEAL_OPEN_UTC
-    
     st.write(f"**Current Time (UTC):**")
-    st.write(current_time.strftime("%Y-%m-%d %H:%M:%S"))
+    st.write(current_time_str)
     
     st.write(f"**Commit Deadline:**")
-    st.write("2025-10-21 21:59:59 UTC")
+    st.write(COMMIT_DEADLINE_STR)
     st.write("(2025-10-21 23:59:59 Paris)")
     
     if commit_open:
@@ -91,7 +161,7 @@ with st.sidebar:
         st.error("❌ Commits CLOSED")
     
     st.write(f"**Reveal Opens:**")
-    st.write("2025-10-21 22:00:00 UTC")
+    st.write(REVEAL_OPEN_STR)
     st.write("(2025-10-22 00:00:00 Paris)")
     
     if reveal_open:
@@ -99,6 +169,17 @@ with st.sidebar:
     else:
         st.warning("⏳ Reveals NOT OPEN")
 
+with st.sidebar:
+    st.header("⚙️ Configuration")
+    api_url = st.text_input("API URL", value=API_DEFAULT)
+    
+    st.divider()
+    
+    _render_timeline()
+
+# Window flags for the tabs; cheap, and current as of this run
+_, _, commit_open, reveal_open = _window_state()
+
 # Main Content Tabs
 tab1, tab2, tab3, tab4 = st.tabs(["📝 Commit", "🔓 Reveal", "📊 Leaderboard", "ℹ️ Instructions"])
 
@@ -136,31 +217,49 @@ with tab1:
             elif not commit_open:
                 st.error("❌ Commit window is closed!")
             else:
-                preimage = f"{uni_id}|{number}|{nonce}"
-                commit_hash = sha256(preimage)
-                
-                st.success("✅ Commitment hash generated!")
-                st.code(commit_hash, language=None)
-                
-                st.warning("⚠️ **IMPORTANT**: Save this information!")
-                st.info(f"""
-**Preimage:** `{preimage}`
+                # Re-hash only when the inputs differ from the last generated commitment
+                last_commit = st.session_state.get("last_commit")
+                if not last_commit or (last_commit["uni_id"], last_commit["number"], last_commit["nonce"]) != (uni_id, number, nonce):
+                    preimage = f"{uni_id}|{number}|{nonce}"
+                    st.session_state["last_commit"] = {
+                        "hash": sha256_preimage(uni_id, number, nonce),
+                        "preimage": preimage,
+                        "uni_id": uni_id,
+                        "number": number,
+                        "nonce": nonce,
+                    }
+                    st.session_state.pop("commit_response", None)
+    
+    # Rendered outside the form: st.button can't live inside one, and this block
+    # has to survive the rerun triggered by the Submit to Server click
+    last_commit = st.session_state.get("last_commit")
+    if last_commit and (last_commit["uni_id"], last_commit["number"], last_commit["nonce"]) == (uni_id, number, nonce):
+        st.success("✅ Commitment hash generated!")
+        st.code(last_commit["hash"], language=None)
+        
+        st.warning("⚠️ **IMPORTANT**: Save this information!")
+        st.info(f"""
+**Preimage:** `{last_commit["preimage"]}`
 
 **You will need:**
-- University ID: `{uni_id}`
-- Number: `{number}`
-- Nonce: `{nonce}`
+- University ID: `{last_commit["uni_id"]}`
+- Number: `{last_commit["number"]}`
+- Nonce: `{last_commit["nonce"]}`
 
 **Write these down NOW!** You'll need them for the reveal phase.
-                """)
-                
-                if st.button("📤 Submit to Server"):
-                    with st.spinner("Submitting..."):
-                        status, response = send_commit(api_url, uni_id, commit_hash)
-                        if status:
-                            st.success(f"✅ Server Response ({status}): {response}")
-                        else:
-                            st.error(f"❌ Error: {response}")
+        """)
+        
+        already_submitted = st.session_state.get("commit_submitted_hash") == last_commit["hash"]
+        st.button("📤 Submit to Server", on_click=_submit_commit_callback, args=(api_url,),
+                  disabled=already_submitted or st.session_state.get("commit_in_flight", False))
+        if already_submitted:
+            st.info("Already submitted.")
+        if "commit_response" in st.session_state:
+            status, response = st.session_state["commit_response"]
+            if status:
+                st.success(f"✅ Server Response ({status}): {response}")
+            else:
+                st.error(f"❌ Error: {response}")
 
 # TAB 2: REVEAL PHASE
 with tab2:
@@ -171,6 +270,9 @@ with tab2:
     else:
         st.success("✅ Reveal window is OPEN. You can now reveal your commitment!")
     
+    st.session_state.setdefault("show_preview", False)
+    st.checkbox("Show commitment hash preview", key="show_preview")
+    
     with st.form("reveal_form"):
         st.subheader("Reveal Your Commitment")
         st.info("Enter EXACTLY what you committed during the commit phase")
@@ -187,9 +289,8 @@ with tab2:
                                         key="reveal_nonce")
         
         # Show what hash this would produce
-        if reveal_uni_id and reveal_nonce:
-            check_preimage = f"{reveal_uni_id}|{reveal_number}|{reveal_nonce}"
-            check_hash = sha256(check_preimage)
+        if st.session_state["show_preview"] and reveal_uni_id and reveal_nonce:
+            check_hash = _preview_hash(reveal_uni_id, reveal_number, reveal_nonce)
             st.info(f"Your commitment hash should be: `{check_hash}`")
         
         submit_reveal = st.form_submit_button("🔓 Reveal Commitment", type="primary")
@@ -212,15 +313,20 @@ with tab2:
 with tab3:
     st.header("📊 Current Status")
     
+    # Tables are cached for 5 seconds; clear once so the next refresh hits the API
+    if st.button("♻️ Force refresh", help="Drop the 5-second table cache so the next refresh re-downloads the tables"):
+        _get_csv_data_cached.clear()
+        st.info("Table cache cleared")
+    
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("📋 Commits")
         if st.button("🔄 Refresh Commits"):
             commits_url = f"{api_url}?table=commits"
-            commits = get_csv_data(commits_url)
+            header, commits = get_csv_data(commits_url)
             if commits:
-                st.dataframe(commits, use_container_width=True)
+                st.dataframe(table_frame(header, commits), use_container_width=True)
                 st.caption(f"Total commits: {len(commits)}")
             else:
                 st.info("No commits yet")
@@ -229,9 +335,9 @@ with tab3:
         st.subheader("🔓 Reveals")
         if st.button("🔄 Refresh Reveals"):
             reveals_url = f"{api_url}?table=reveals"
-            reveals = get_csv_data(reveals_url)
+            header, reveals = get_csv_data(reveals_url)
             if reveals:
-                st.dataframe(reveals, use_container_width=True)
+                st.dataframe(table_frame(header, reveals), use_container_width=True)
                 st.caption(f"Total reveals: {len(reveals)}")
             else:
                 st.info("No reveals yet")
@@ -241,50 +347,60 @@ with tab3:
     # Calculate Results
     if st.button("🏆 Calculate Winners", type="primary"):
         with st.spinner("Calculating results..."):
-            commits_url = f"{api_url}?table=commits"
             reveals_url = f"{api_url}?table=reveals"
             
-            commits_data = get_csv_data(commits_url)
-            reveals_data = get_csv_data(reveals_url)
-            
-            if not reveals_data:
+            reveals_header, reveals_rows = get_csv_data(reveals_url)
+            if not reveals_rows:
                 st.warning("No reveals yet to calculate winners")
             else:
                 # Simple verification (you can expand this with the full logic from merge script)
-                valid_numbers = []
-                for reveal in reveals_data:
-                    try:
-                        num = int(reveal.get('number', ''))
-                        if 0 <= num <= 100:
-                            valid_numbers.append(num)
-                    except:
-                        pass
+                # One pass validates, parses and range-checks; average and
+                # distances both run over the same in-range entries
+                idx_number = reveals_header.index('number') if 'number' in reveals_header else -1
+                idx_uni = reveals_header.index('uni_id') if 'uni_id' in reveals_header else -1
+                nums, idxs = [], []
+                if idx_number >= 0:
+                    for i, row in enumerate(reveals_rows):
+                        # isdecimal, not isdigit: "²" is a digit that int() rejects
+                        if len(row) > idx_number and row[idx_number].isdecimal():
+                            v = int(row[idx_number])
+                            if v <= 100:
+                                nums.append(v)
+                                idxs.append(i)
+                nums = np.asarray(nums, dtype=np.int32)
                 
-                if valid_numbers:
-                    avg = mean(valid_numbers)
+                if nums.size:
+                    avg = float(nums.mean())
                     target = K_FACTOR * avg
                     
                     st.success("✅ Results Calculated!")
                     
                     col1, col2, col3 = st.columns(3)
                     with col1:
-                        st.metric("Participants", len(valid_numbers))
+                        st.metric("Participants", int(nums.size))
                     with col2:
                         st.metric("Average", f"{avg:.2f}")
                     with col3:
                         st.metric("Target (2/3 × avg)", f"{target:.2f}")
                     
-                    # Find closest
-                    distances = [(reveal, abs(int(reveal.get('number', 0)) - target)) 
-                                for reveal in reveals_data 
-                                if reveal.get('number', '').isdigit()]
+                    # Find closest: stable sort keeps input order among tied distances
+                    dists = np.abs(nums - target)
+                    top = np.argsort(dists, kind="stable")[:5]
                     
-                    if distances:
-                        distances.sort(key=lambda x: x[1])
-                        
-                        st.subheader("🏆 Top 5 Closest")
-                        for i, (reveal, dist) in enumerate(distances[:5], 1):
-                            st.write(f"{i}. **{reveal.get('uni_id')}** - Number: {reveal.get('number')} - Distance: {dist:.4f}")
+                    st.subheader("🏆 Top 5 Closest")
+                    st.dataframe(
+                        [
+                            {
+                                "Rank": rank,
+                                "University ID": reveals_rows[idxs[i]][idx_uni] if idx_uni >= 0 else None,
+                                "Number": int(nums[i]),
+                                "Distance": round(float(dists[i]), 4),
+                            }
+                            for rank, i in enumerate(top, 1)
+                        ],
+                        use_container_width=True,
+                        hide_index=True,
+                    )
 
 # TAB 4: INSTRUCTIONS
 with tab4:
@@ -6,10 +6,10 @@ Run with: streamlit run app.py
 import streamlit as st
 import hashlib
 import requests
-import csv
-import io
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timezone
-from statistics import mean
+import numpy as np
 import pandas as pd
 
 # Configuration
@@ -19,8 +19,14 @@ REVEAL_OPEN_UTC = datetime(2025, 10, 21, 22, 0, 0, tzinfo=timezone.utc)
 K_FACTOR = 2/3
 
 # Helper Functions
-def sha256(s: str) -> str:
-    return hashlib.sha256(s.encode("utf-8")).hexdigest()
+def _sha256_raw(s) -> str:
+    # bytes go straight to OpenSSL (SHA-NI / ARMv8 SHA2 where available); str is UTF-8 encoded
+    return hashlib.sha256(s if isinstance(s, (bytes, bytearray)) else s.encode("utf-8")).hexdigest()
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def sha256(s) -> str:
+    """Memoized across reruns; use _sha256_raw for one-shot hashes."""
+    return _sha256_raw(s)
 
 def now_utc():
     return datetime.now(timezone.utc)
@@ -28,19 +34,66 @@ def now_utc():
 def format_dt(dt: datetime):
     return dt.strftime("%Y-%m-%d %H:%M:%S UTC")
 
+COMMIT_DEADLINE_STR = format_dt(COMMIT_DEADLINE_UTC)
+REVEAL_OPEN_STR = format_dt(REVEAL_OPEN_UTC)
+
+@st.cache_data(ttl=1, show_spinner=False)
+def _now_str_and_dt():
+    """Current time and its display string, computed at most once per second."""
+    n = now_utc()
+    return n, format_dt(n)
+
+@st.cache_resource
+def _session() -> requests.Session:
+    """One pooled session kept across reruns so keep-alive reuses the TLS connection."""
+    s = requests.Session()
+    # Pinned so the CSV tables always come back compressed; urllib3 decodes it
+    s.headers.update({"Accept-Encoding": "gzip, deflate"})
+    # Two hosts: Apps Script plus its googleusercontent redirect
+    adapter = HTTPAdapter(
+        pool_connections=2,
+        pool_maxsize=4,
+        max_retries=Retry(total=2, backoff_factor=0.3),
+    )
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+# The fetcher raises so that failures are never cached; get_csv_data reports them
+@st.cache_data(ttl=30, show_spinner=False)
+def _fetch_csv(url: str):
+    with _session().get(url, timeout=20, stream=True) as r:
+        r.raise_for_status()
+        # Feed urllib3's (decompressed) stream straight to the C parser instead
+        # of materializing r.text; everything stays str like csv.DictReader
+        r.raw.decode_content = True
+        try:
+            df = pd.read_csv(r.raw, engine="c", dtype=str, na_filter=False,
+                             encoding=r.encoding or "utf-8")
+        except pd.errors.EmptyDataError:
+            df = pd.DataFrame()
+    return df, now_utc()
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _clean_reveals(df: pd.DataFrame) -> pd.Series:
+    """Valid reveal numbers (integers in 0..100) as int8, indexed like df."""
+    raw = df.get("number", pd.Series("", index=df.index))
+    # Integer literals only, as int() accepted them: "5.0" and "1e1" stay invalid
+    nums = pd.to_numeric(raw.where(raw.str.fullmatch(r"\s*[+-]?\d+\s*", na=False)), errors="coerce")
+    return nums[nums.between(0, 100)].astype("int8")
+
 def get_csv_data(url: str):
+    """(DataFrame, fetched_at) for the table at url, served from a 30 s cache."""
     try:
-        r = requests.get(url, timeout=20)
-        r.raise_for_status()
-        return list(csv.DictReader(io.StringIO(r.text)))
+        return _fetch_csv(url)
     except Exception as e:
         st.error(f"Error fetching data: {e}")
-        return []
+        return pd.DataFrame(), None
 
 def send_commit(api_url, uni_id, commit_hash):
     payload = {"kind": "commit", "uni_id": uni_id, "commit": commit_hash}
     try:
-        r = requests.post(api_url, json=payload, timeout=15)
+        r = _session().post(api_url, json=payload, timeout=15)
         return r.status_code, r.text
     except Exception as e:
         return None, str(e)
@@ -48,7 +101,7 @@ def send_commit(api_url, uni_id, commit_hash):
 def send_reveal(api_url, uni_id, number, nonce):
     payload = {"kind": "reveal", "uni_id": uni_id, "number": number, "nonce": nonce}
     try:
-        r = requests.post(api_url, json=payload, timeout=15)
+        r = _session().post(api_url, json=payload, timeout=15)
         return r.status_code, r.text
     except Exception as e:
         return None, str(e)
@@ -90,17 +143,17 @@ with st.sidebar:
     st.markdown("---")
 
     st.subheader("⏰ Game Timeline")
-    current_time = now_utc()
+    current_time, current_time_str = _now_str_and_dt()
 
     commit_open = current_time <= COMMIT_DEADLINE_UTC
     reveal_open = current_time >= REVEAL_OPEN_UTC
 
     st.write(f"**Current Time (UTC):**")
-    st.code(format_dt(current_time), language=None)
+    st.code(current_time_str, language=None)
 
     col_a, col_b = st.columns(2)
-    col_a.metric("Commit Deadline", format_dt(COMMIT_DEADLINE_UTC))
-    col_b.metric("Reveal Opens", format_dt(REVEAL_OPEN_UTC))
+    col_a.metric("Commit Deadline", COMMIT_DEADLINE_STR)
+    col_b.metric("Reveal Opens", REVEAL_OPEN_STR)
 
     st.markdown("")
     if commit_open:
@@ -158,7 +211,7 @@ with tab1:
                 st.error("❌ Commit window is closed!")
             else:
                 preimage = f"{uni_id}|{number}|{nonce}"
-                commit_hash = sha256(preimage)
+                commit_hash = _sha256_raw(preimage)
 
                 # store in session for use by submit button
                 st.session_state["last_commit_hash"] = commit_hash
@@ -186,15 +239,9 @@ with tab1:
                             st.error(f"❌ Error: {response}")
 
 # TAB 2: REVEAL PHASE
-with tab2:
-    st.header("🔓 Reveal Phase")
-    st.write("After the deadline, reveal your original number and nonce to verify your commitment.")
-
-    if not reveal_open:
-        st.warning("⏳ The reveal window is NOT open yet. Wait until after the deadline.")
-    else:
-        st.success("✅ Reveal window is OPEN. You can now reveal your commitment!")
-
+@st.fragment
+def _reveal_fragment(reveal_open, api_url):
+    """Reveal form; typing and submitting here rerun only this fragment."""
     with st.form("reveal_form"):
         st.subheader("Reveal Your Commitment")
         st.info("Enter EXACTLY what you committed during the commit phase")
@@ -216,9 +263,15 @@ with tab2:
                 st.text_area("Last Preimage (do not edit)", value=st.session_state["last_preimage"], height=80, key="session_preimage")
 
         # Show what hash this would produce
-        if reveal_uni_id and reveal_nonce is not None:
-            check_preimage = f"{reveal_uni_id}|{reveal_number}|{reveal_nonce}"
-            check_hash = sha256(check_preimage)
+        if reveal_uni_id and len(reveal_nonce) >= 1:
+            # Same inputs as the last run: reuse the hash without rebuilding the preimage
+            key = (reveal_uni_id, reveal_number, reveal_nonce)
+            if key == st.session_state.get("_last_reveal_key"):
+                check_hash = st.session_state["_last_reveal_hash"]
+            else:
+                check_hash = sha256(f"{reveal_uni_id}|{reveal_number}|{reveal_nonce}")
+                st.session_state["_last_reveal_key"] = key
+                st.session_state["_last_reveal_hash"] = check_hash
             st.info(f"Your commitment hash should be: `{check_hash}`")
 
         submit_reveal = st.form_submit_button("🔓 Reveal Commitment", type="primary")
@@ -237,10 +290,25 @@ with tab2:
                     else:
                         st.error(f"❌ Error: {response}")
 
+with tab2:
+    st.header("🔓 Reveal Phase")
+    st.write("After the deadline, reveal your original number and nonce to verify your commitment.")
+
+    if not reveal_open:
+        st.warning("⏳ The reveal window is NOT open yet. Wait until after the deadline.")
+    else:
+        st.success("✅ Reveal window is OPEN. You can now reveal your commitment!")
+
+    _reveal_fragment(reveal_open, api_url)
+
 # TAB 3: LEADERBOARD
 with tab3:
     st.header("📊 Current Status & Results")
 
+    if st.button("♻️ Force refresh", help="Drop the 30 s table cache so the next refresh hits the API"):
+        _fetch_csv.clear()
+        st.info("Table cache cleared")
+
     left, right = st.columns([2, 1])
 
     with left:
@@ -248,49 +316,47 @@ with tab3:
         commits_btn, reveals_btn, calc_btn = st.columns(3)
         if commits_btn.button("🔄 Refresh Commits"):
             commits_url = f"{api_url}?table=commits"
-            commits = get_csv_data(commits_url)
-            if commits:
-                df_commits = pd.DataFrame(commits)
+            df_commits, fetched_at = get_csv_data(commits_url)
+            if not df_commits.empty:
                 st.session_state["latest_commits"] = df_commits
                 st.dataframe(df_commits, use_container_width=True)
-                st.caption(f"Total commits: {len(df_commits)}")
+                st.caption(f"Total commits: {len(df_commits)} · fetched {format_dt(fetched_at)}")
             else:
                 st.info("No commits yet")
 
         if reveals_btn.button("🔄 Refresh Reveals"):
             reveals_url = f"{api_url}?table=reveals"
-            reveals = get_csv_data(reveals_url)
-            if reveals:
-                df_reveals = pd.DataFrame(reveals)
+            df_reveals, fetched_at = get_csv_data(reveals_url)
+            if not df_reveals.empty:
                 st.session_state["latest_reveals"] = df_reveals
                 st.dataframe(df_reveals, use_container_width=True)
-                st.caption(f"Total reveals: {len(df_reveals)}")
+                st.caption(f"Total reveals: {len(df_reveals)} · fetched {format_dt(fetched_at)}")
             else:
                 st.info("No reveals yet")
 
+        # Parsed once per reveals table and shared by the chart and Quick Stats
+        latest_reveals = st.session_state.get("latest_reveals")
+        latest_nums = None if latest_reveals is None or latest_reveals.empty else _clean_reveals(latest_reveals)
+
         st.markdown("---")
 
         # Show a quick distribution chart if reveals are present in session
-        if "latest_reveals" in st.session_state and not st.session_state["latest_reveals"].empty:
-            df = st.session_state["latest_reveals"].copy()
-            # Ensure numeric
-            df["number_int"] = pd.to_numeric(df.get("number", pd.Series()), errors="coerce")
-            counts = df["number_int"].dropna().astype(int).value_counts().sort_index()
-            if not counts.empty:
+        if latest_nums is not None:
+            # Bounded 0-100 domain: one bincount pass instead of value_counts + sort
+            arr = latest_nums.to_numpy()
+            if arr.size:
+                counts = np.bincount(arr, minlength=101).astype(np.int32)
                 st.subheader("Reveal Distribution")
-                st.bar_chart(counts)
+                st.bar_chart(pd.Series(counts, index=np.arange(101)))
 
     with right:
         st.subheader("Quick Stats")
         # show participants / averages if reveals present
-        if "latest_reveals" in st.session_state and not st.session_state["latest_reveals"].empty:
-            df = st.session_state["latest_reveals"].copy()
-            df["number_int"] = pd.to_numeric(df.get("number", pd.Series()), errors="coerce")
-            valid_numbers = df["number_int"].dropna().astype(int).tolist()
-            if valid_numbers:
-                avg = mean(valid_numbers)
+        if latest_nums is not None:
+            if not latest_nums.empty:
+                avg = float(latest_nums.mean())
                 target = K_FACTOR * avg
-                st.metric("Participants (revealed)", len(valid_numbers))
+                st.metric("Participants (revealed)", len(latest_nums))
                 st.metric("Average", f"{avg:.2f}")
                 st.metric("Target (2/3 × avg)", f"{target:.2f}")
         else:
@@ -301,57 +367,46 @@ with tab3:
     # Calculate Results Button and logic
     if st.button("🏆 Calculate Winners", type="primary"):
         with st.spinner("Calculating results..."):
-            commits_url = f"{api_url}?table=commits"
             reveals_url = f"{api_url}?table=reveals"
+            reveals_data, _ = get_csv_data(reveals_url)
 
-            commits_data = get_csv_data(commits_url)
-            reveals_data = get_csv_data(reveals_url)
-
-            if not reveals_data:
+            if reveals_data.empty:
                 st.warning("No reveals yet to calculate winners")
             else:
                 # Simple verification (you can expand this with the full logic from merge script)
-                valid_numbers = []
-                parsed_reveals = []
-                for reveal in reveals_data:
-                    try:
-                        num = int(reveal.get('number', ''))
-                        if 0 <= num <= 100:
-                            valid_numbers.append(num)
-                            parsed_reveals.append({
-                                "uni_id": reveal.get("uni_id"),
-                                "number": num,
-                                "nonce": reveal.get("nonce", "")
-                            })
-                    except:
-                        pass
-
-                if valid_numbers:
-                    avg = mean(valid_numbers)
+                # Coerce once, mask once, then work on the filtered frame directly
+                nums = _clean_reveals(reveals_data)
+                results_df = reveals_data.loc[nums.index].reindex(columns=["uni_id", "number", "nonce"]).assign(number=nums)
+
+                if not results_df.empty:
+                    avg = float(results_df["number"].mean())
                     target = K_FACTOR * avg
 
                     st.success("✅ Results Calculated!")
 
                     col1, col2, col3 = st.columns(3)
                     with col1:
-                        st.metric("Participants", len(valid_numbers))
+                        st.metric("Participants", len(results_df))
                     with col2:
                         st.metric("Average", f"{avg:.2f}")
                     with col3:
                         st.metric("Target (2/3 × avg)", f"{target:.2f}")
 
-                    # Build DataFrame of distances
-                    results_df = pd.DataFrame(parsed_reveals)
-                    results_df["distance"] = (results_df["number"] - target).abs()
-                    results_df = results_df.sort_values("distance").reset_index(drop=True)
+                    distances = results_df["number"].to_numpy() - target
+                    np.abs(distances, out=distances)
+                    results_df["distance"] = distances
+                    # One stable sort feeds both views; ties keep input order
+                    results_df = results_df.sort_values("distance", kind="stable").reset_index(drop=True)
+                    # Ranking ran in float64; only the displayed column is narrowed
+                    results_df["distance"] = results_df["distance"].astype("float32")
                     results_df.index += 1
                     results_df.index.name = "Rank"
 
                     st.subheader("🏆 Top 10 Closest")
                     st.table(results_df.head(10)[["number", "distance"]])
 
-                    st.markdown("Full results:")
-                    st.dataframe(results_df, use_container_width=True)
+                    with st.expander("Show all results"):
+                        st.dataframe(results_df, use_container_width=True)
                 else:
                     st.warning("No valid numeric reveals found to compute results.")
 
@@ -6,10 +6,16 @@ Run with: streamlit run app.py
 import streamlit as st
 import hashlib
 import requests
-import csv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import io
+import logging
+import time
 from datetime import datetime, timezone
-from statistics import mean
+from collections import namedtuple
+import numpy as np
 import pandas as pd
 
 # Configuration (UNCHANGED)
@@ -18,10 +24,18 @@ COMMIT_DEADLINE_UTC = datetime(2025, 10, 21, 21, 59, 59, tzinfo=timezone.utc)
 REVEAL_OPEN_UTC = datetime(2025, 10, 21, 22, 0, 0, tzinfo=timezone.utc)
 K_FACTOR = 2/3
 
+logger = logging.getLogger(__name__)
+
 # Helper Functions
 def sha256(s: str) -> str:
     return hashlib.sha256(s.encode("utf-8")).hexdigest()
 
+@st.cache_data(max_entries=256, show_spinner=False)
+def sha256_cached(s: str) -> str:
+    """sha256 memoized across reruns, for the reveal preview only; commit
+    generation stays on the uncached helper so preimages aren't kept around."""
+    return sha256(s)
+
 def now_utc():
     return datetime.now(timezone.utc)
 
@@ -47,19 +61,53 @@ def time_delta_str(future_dt: datetime):
         parts.append(f"{seconds}s")
     return " ".join(parts)
 
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Pooled session shared across reruns and across every user session in this
+    process, so all of them reuse the same warm TLS connections."""
+    s = requests.Session()
+    # CSV tables compress well; urllib3 decodes gzip/deflate transparently
+    s.headers.update({"User-Agent": "beauty-contest/1.0", "Accept-Encoding": "gzip, deflate"})
+    s.mount("https://", HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=32,
+        # POST stays out of allowed_methods: a 5xx after the server appended
+        # the row would otherwise submit the commit/reveal twice. Connect
+        # failures (nothing sent yet) are still retried for every method.
+        max_retries=Retry(total=3, connect=2, read=1, backoff_factor=0.3,
+                          status_forcelist=[429, 500, 502, 503, 504]),
+    ))
+    return s
+
+def _get_csv_data_raw(url: str):
+    r = get_session().get(url, timeout=(5, 20))
+    r.raise_for_status()
+    logger.debug("GET %s: %d bytes, Content-Encoding=%s",
+                 url, len(r.content), r.headers.get("Content-Encoding", "identity"))
+    # One C-level pass from the raw bytes into a DataFrame; values stay str
+    # (no NA inference) like the csv.DictReader rows did
+    try:
+        return pd.read_csv(io.BytesIO(r.content), dtype=str, keep_default_na=False)
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame()
+
+# Keyed by URL, so commits and reveals expire independently. Errors propagate
+# out of the cached call and are never stored.
+@st.cache_data(ttl=30, show_spinner=False)
+def _get_csv_data_cached(url: str):
+    return _get_csv_data_raw(url)
+
 def get_csv_data(url: str):
     try:
-        r = requests.get(url, timeout=20)
-        r.raise_for_status()
-        return list(csv.DictReader(io.StringIO(r.text)))
+        return _get_csv_data_cached(url)
     except Exception as e:
         st.error(f"Error fetching data: {e}")
-        return []
+        return pd.DataFrame()
 
 def send_commit(api_url, uni_id, commit_hash):
     payload = {"kind": "commit", "uni_id": uni_id, "commit": commit_hash}
     try:
-        r = requests.post(api_url, json=payload, timeout=15)
+        r = get_session().post(api_url, json=payload, timeout=(5, 15))
         return r.status_code, r.text
     except Exception as e:
         return None, str(e)
@@ -67,20 +115,97 @@ def send_commit(api_url, uni_id, commit_hash):
 def send_reveal(api_url, uni_id, number, nonce):
     payload = {"kind": "reveal", "uni_id": uni_id, "number": number, "nonce": nonce}
     try:
-        r = requests.post(api_url, json=payload, timeout=15)
+        r = get_session().post(api_url, json=payload, timeout=(5, 15))
         return r.status_code, r.text
     except Exception as e:
         return None, str(e)
 
+@st.cache_resource
+def get_submit_pool():
+    """Worker pool for commit/reveal POSTs, shared across sessions."""
+    return ThreadPoolExecutor(max_workers=4)
+
+def run_submit(label, fn, *args):
+    """Run a send_* call on the submit pool and poll it under st.status.
+
+    The status updates keep the script interruptible while the POST is in
+    flight, so a widget change reruns the app instead of waiting on the network.
+    send_* never touch st, so the shared workers need no script context."""
+    future = get_submit_pool().submit(fn, *args)
+    started = time.monotonic()
+    with st.status(label) as status:
+        while not future.done():
+            time.sleep(0.1)
+            status.update(label=f"{label} ({time.monotonic() - started:.1f}s)")
+        code, response = future.result()
+        status.update(label=label, state="complete" if code else "error")
+    return code, response
+
+def fetch_tables(api_url):
+    """Fetch the commits and reveals tables concurrently; returns (commits, reveals).
+
+    Workers get this run's script context so st.error in get_csv_data still works."""
+    with ThreadPoolExecutor(
+        max_workers=2,
+        initializer=add_script_run_ctx,
+        initargs=(None, get_script_run_ctx()),
+    ) as ex:
+        f_c = ex.submit(get_csv_data, f"{api_url}?table=commits")
+        f_r = ex.submit(get_csv_data, f"{api_url}?table=reveals")
+        return f_c.result(), f_r.result()
+
+ParsedReveals = namedtuple("ParsedReveals", "df avg target counts")
+
+def _parse_reveals(df: pd.DataFrame) -> ParsedReveals:
+    """Valid reveals (integer numbers in 0..100) plus the stats every Tab 3 section needs.
+
+    The range check runs before the int8 cast so out-of-range values can't wrap."""
+    clean = df.reindex(columns=["uni_id", "number", "nonce"]).fillna("")
+    # Integer literals only, as int() accepted them: "5.0" and "1e1" stay invalid
+    literal = clean["number"].astype(str).str.fullmatch(r"\s*[+-]?\d+\s*", na=False)
+    clean["number"] = pd.to_numeric(clean["number"].where(literal), errors="coerce")
+    clean = clean[clean["number"].between(0, 100)]
+    clean = clean.astype({"number": "int8"})
+    if clean.empty:
+        return ParsedReveals(clean, None, None, pd.Series(dtype="int64"))
+    # Plain NumPy mean on the int8 buffer; the NaN-aware Series path is not needed here
+    avg = float(clean["number"].to_numpy().mean())
+    return ParsedReveals(clean, avg, K_FACTOR * avg, clean["number"].value_counts().sort_index())
+
+@st.cache_data(ttl=30, show_spinner=False)
+def compute_winners(reveals: pd.DataFrame):
+    """Valid reveals ranked by distance to the target; returns (ranked, avg, target).
+
+    Keyed on the reveals table contents, so repeat clicks on unchanged data skip
+    the parse and sort."""
+    parsed = _parse_reveals(reveals)
+    if parsed.df.empty:
+        return parsed.df, None, None
+    ranked = parsed.df.copy()
+    # Rank on float64 distances; float32 would merge near-ties into false draws
+    ranked["distance"] = (ranked["number"].astype("float64") - parsed.target).abs()
+    ranked = ranked.sort_values("distance", kind="stable").reset_index(drop=True)
+    ranked["distance"] = ranked["distance"].astype("float32")  # display only
+    ranked.index += 1
+    ranked.index.name = "Rank"
+    return ranked, parsed.avg, parsed.target
+
+def set_latest_reveals(df: pd.DataFrame):
+    """Store the reveals table together with its parsed bundle, parsed once per refresh."""
+    st.session_state["latest_reveals"] = df
+    st.session_state["parsed_reveals"] = _parse_reveals(df)
+
 # Session state
 if "last_commit_hash" not in st.session_state:
     st.session_state["last_commit_hash"] = ""
 if "last_preimage" not in st.session_state:
     st.session_state["last_preimage"] = ""
+if "last_commit_uni" not in st.session_state:
+    st.session_state["last_commit_uni"] = ""
 if "latest_commits" not in st.session_state:
     st.session_state["latest_commits"] = pd.DataFrame()
-if "latest_reveals" not in st.session_state:
-    st.session_state["latest_reveals"] = pd.DataFrame()
+if "parsed_reveals" not in st.session_state:
+    set_latest_reveals(st.session_state.get("latest_reveals", pd.DataFrame()))
 
 # Page config
 st.set_page_config(page_title="Beauty Contest Game", page_icon="🎯", layout="wide")
@@ -91,7 +216,6 @@ st.markdown(
     <style>
     .big-title { font-size:30px; font-weight:700; margin:0; }
     .muted { color:#6c757d; }
-    .phase-card { background:#ffffff; border-radius:10px; padding:18px; box-shadow:0 1px 6px rgba(0,0,0,0.06); }
     .small { font-size:13px; color:#6c757d; }
     .highlight { background:linear-gradient(90deg,#e7f5ff,#fff); padding:8px 12px; border-radius:8px; }
     </style>
@@ -154,129 +278,131 @@ with tab1:
     st.header("📝 Commit Phase")
     cols = st.columns([3, 1])
     with cols[0]:
-        st.markdown('<div class="phase-card">', unsafe_allow_html=True)
-        if commit_open:
-            st.info("Commit window is OPEN. Generate and submit your commitment before the deadline.")
-        else:
-            st.error("Commit window is CLOSED. You cannot submit commits now.")
-
-        with st.form("commit_form", clear_on_submit=False):
-            st.subheader("Create Commitment")
-            c1, c2 = st.columns([2, 1])
-            with c1:
-                uni_id = st.text_input("University ID", help="Unique identifier (e.g., student ID)", key="commit_uni")
-                number = st.number_input("Your chosen number (0-100)", min_value=0, max_value=100, value=50,
-                                        help="Pick an integer between 0 and 100", key="commit_number")
-                nonce = st.text_input("Secret Nonce", type="password", help="A secret string only you know", key="commit_nonce")
-                nonce_confirm = st.text_input("Confirm Nonce", type="password", key="commit_nonce_confirm")
-            with c2:
-                st.markdown("#### Tips")
-                st.write("- Use a long random nonce (e.g., s3cure-phrase-XYZ).")
-                st.write("- After generating, download the preimage for safekeeping.")
-                st.write("- You can generate first, then submit to server.")
-            submit_commit = st.form_submit_button("Generate Commitment Hash", type="primary")
-            if submit_commit:
-                if not uni_id or not nonce:
-                    st.error("❌ Please fill in all fields")
-                elif nonce != nonce_confirm:
-                    st.error("❌ Nonces don't match")
-                elif not commit_open:
-                    st.error("❌ Commit window is closed")
-                else:
-                    preimage = f"{uni_id}|{number}|{nonce}"
-                    commit_hash = sha256(preimage)
-                    st.session_state["last_preimage"] = preimage
-                    st.session_state["last_commit_hash"] = commit_hash
-
-                    st.success("✅ Commitment hash generated")
-                    st.markdown('<div class="highlight">', unsafe_allow_html=True)
-                    st.write("Commit Hash:")
-                    st.code(commit_hash, language=None)
-                    st.markdown('</div>', unsafe_allow_html=True)
-
-                    with st.expander("Preimage & actions"):
-                        st.write("Preimage (keep this safe):")
-                        st.code(preimage, language=None)
-                        st.download_button("⬇️ Download Preimage", preimage, file_name=f"preimage_{uni_id}.txt")
-                        st.download_button("⬇️ Download Commit Hash", commit_hash, file_name=f"commit_{uni_id}.txt")
-                        st.text_area("Commit Hash (copy)", value=commit_hash, height=60, key="commit_copy_area")
-
-                    if st.button("📤 Submit to Server", key="commit_submit_server"):
-                        with st.spinner("Submitting commit..."):
-                            status, response = send_commit(api_url, uni_id, commit_hash)
-                            if status:
-                                st.success(f"✅ Server Response ({status}): {response}")
-                            else:
-                                st.error(f"❌ Error: {response}")
-
-        st.markdown('</div>', unsafe_allow_html=True)
+        with st.container(border=True):
+            if commit_open:
+                st.info("Commit window is OPEN. Generate and submit your commitment before the deadline.")
+            else:
+                st.error("Commit window is CLOSED. You cannot submit commits now.")
+
+            with st.form("commit_form", clear_on_submit=False):
+                st.subheader("Create Commitment")
+                c1, c2 = st.columns([2, 1])
+                with c1:
+                    uni_id = st.text_input("University ID", help="Unique identifier (e.g., student ID)", key="commit_uni")
+                    number = st.number_input("Your chosen number (0-100)", min_value=0, max_value=100, value=50,
+                                            help="Pick an integer between 0 and 100", key="commit_number")
+                    nonce = st.text_input("Secret Nonce", type="password", help="A secret string only you know", key="commit_nonce")
+                    nonce_confirm = st.text_input("Confirm Nonce", type="password", key="commit_nonce_confirm")
+                with c2:
+                    st.markdown("#### Tips")
+                    st.write("- Use a long random nonce (e.g., s3cure-phrase-XYZ).")
+                    st.write("- After generating, download the preimage for safekeeping.")
+                    st.write("- You can generate first, then submit to server.")
+                submit_commit = st.form_submit_button("Generate Commitment Hash", type="primary")
+                if submit_commit:
+                    if not uni_id or not nonce:
+                        st.error("❌ Please fill in all fields")
+                    elif nonce != nonce_confirm:
+                        st.error("❌ Nonces don't match")
+                    elif not commit_open:
+                        st.error("❌ Commit window is closed")
+                    else:
+                        preimage = f"{uni_id}|{number}|{nonce}"
+                        commit_hash = sha256(preimage)
+                        st.session_state["last_preimage"] = preimage
+                        st.session_state["last_commit_hash"] = commit_hash
+                        st.session_state["last_commit_uni"] = uni_id
+
+            # Results render outside the form: download and submit buttons aren't allowed inside one.
+            if st.session_state["last_commit_hash"]:
+                commit_hash = st.session_state["last_commit_hash"]
+                preimage = st.session_state["last_preimage"]
+                commit_uni = st.session_state["last_commit_uni"]
+                st.success("✅ Commitment hash generated")
+                st.markdown('<div class="highlight">', unsafe_allow_html=True)
+                st.write("Commit Hash:")
+                st.code(commit_hash, language=None)
+                st.markdown('</div>', unsafe_allow_html=True)
+
+                with st.expander("Preimage & actions"):
+                    st.write("Preimage (keep this safe):")
+                    st.code(preimage, language=None)
+                    st.download_button("⬇️ Download Preimage", preimage, file_name=f"preimage_{commit_uni}.txt")
+                    st.download_button("⬇️ Download Commit Hash", commit_hash, file_name=f"commit_{commit_uni}.txt")
+                    st.text_area("Commit Hash (copy)", value=commit_hash, height=60, key="commit_copy_area")
+
+                if commit_open and st.button("📤 Submit to Server", key="commit_submit_server"):
+                    status, response = run_submit("Submitting commit...", send_commit, api_url, commit_uni, commit_hash)
+                    if status:
+                        st.success(f"✅ Server Response ({status}): {response}")
+                    else:
+                        st.error(f"❌ Error: {response}")
 
     with cols[1]:
         # summary card
-        st.markdown('<div class="phase-card">', unsafe_allow_html=True)
-        st.subheader("Quick Summary")
-        st.write("• Commit before the deadline.")
-        st.write("• Keep your nonce & number secret until reveal.")
-        st.write("• Download preimage to avoid losing it.")
-        if st.session_state["last_commit_hash"]:
-            st.markdown("**Last Hash (this session):**")
-            st.code(st.session_state["last_commit_hash"], language=None)
-        st.markdown('</div>', unsafe_allow_html=True)
+        with st.container(border=True):
+            st.subheader("Quick Summary")
+            st.write("• Commit before the deadline.")
+            st.write("• Keep your nonce & number secret until reveal.")
+            st.write("• Download preimage to avoid losing it.")
+            if st.session_state["last_commit_hash"]:
+                st.markdown("**Last Hash (this session):**")
+                st.code(st.session_state["last_commit_hash"], language=None)
 
 # TAB 2 - Reveal
 with tab2:
     st.header("🔓 Reveal Phase")
     cols = st.columns([3, 1])
     with cols[0]:
-        st.markdown('<div class="phase-card">', unsafe_allow_html=True)
-        if reveal_open:
-            st.success("Reveal window is OPEN. Submit your reveal now.")
-        else:
-            st.info("Reveal window not open yet. Wait for the reveal time.")
-
-        with st.form("reveal_form"):
-            st.subheader("Reveal Your Commitment")
-            st.info("Enter exactly the same University ID, number, and nonce you used during commit.")
-            r1, r2 = st.columns([2, 1])
-            with r1:
-                reveal_uni_id = st.text_input("University ID (same as commit)", key="reveal_uni")
-                reveal_number = st.number_input("Number (same as commit)", min_value=0, max_value=100, value=50, key="reveal_number")
-                reveal_nonce = st.text_input("Secret Nonce (same as commit)", type="password", key="reveal_nonce")
-            with r2:
-                st.markdown("#### Helpful")
-                st.write("- If you used this session to generate preimage, it's shown below.")
-                if st.session_state.get("last_preimage"):
-                    st.write("Last generated preimage (read-only):")
-                    st.text_area("Session preimage", value=st.session_state["last_preimage"], height=80, key="session_preimage_area")
-            # preview hash
-            if reveal_uni_id and reveal_nonce is not None:
-                check_preimage = f"{reveal_uni_id}|{reveal_number}|{reveal_nonce}"
-                check_hash = sha256(check_preimage)
-                st.info(f"Commitment hash computed from your input: `{check_hash}`")
-            submit_reveal = st.form_submit_button("🔓 Reveal Commitment", type="primary")
-            if submit_reveal:
-                if not reveal_uni_id or not reveal_nonce:
-                    st.error("❌ Please fill in all fields")
-                elif not reveal_open:
-                    st.error("❌ Reveal window is not open yet!")
-                else:
-                    with st.spinner("Submitting reveal..."):
-                        status, response = send_reveal(api_url, reveal_uni_id, reveal_number, reveal_nonce)
+        with st.container(border=True):
+            if reveal_open:
+                st.success("Reveal window is OPEN. Submit your reveal now.")
+            else:
+                st.info("Reveal window not open yet. Wait for the reveal time.")
+
+            show_preview = st.checkbox("Show live commitment hash preview", value=False)
+
+            with st.form("reveal_form"):
+                st.subheader("Reveal Your Commitment")
+                st.info("Enter exactly the same University ID, number, and nonce you used during commit.")
+                r1, r2 = st.columns([2, 1])
+                with r1:
+                    reveal_uni_id = st.text_input("University ID (same as commit)", key="reveal_uni")
+                    reveal_number = st.number_input("Number (same as commit)", min_value=0, max_value=100, value=50, key="reveal_number")
+                    reveal_nonce = st.text_input("Secret Nonce (same as commit)", type="password", key="reveal_nonce")
+                with r2:
+                    st.markdown("#### Helpful")
+                    st.write("- If you used this session to generate preimage, it's shown below.")
+                    if st.session_state.get("last_preimage"):
+                        st.write("Last generated preimage (read-only):")
+                        st.text_area("Session preimage", value=st.session_state["last_preimage"], height=80, key="session_preimage_area")
+                # preview hash
+                if show_preview and reveal_uni_id and reveal_nonce:
+                    check_preimage = f"{reveal_uni_id}|{reveal_number}|{reveal_nonce}"
+                    check_hash = sha256_cached(check_preimage)
+                    st.info(f"Commitment hash computed from your input: `{check_hash}`")
+                submit_reveal = st.form_submit_button("🔓 Reveal Commitment", type="primary")
+                if submit_reveal:
+                    if not reveal_uni_id or not reveal_nonce:
+                        st.error("❌ Please fill in all fields")
+                    elif not reveal_open:
+                        st.error("❌ Reveal window is not open yet!")
+                    else:
+                        status, response = run_submit(
+                            "Submitting reveal...", send_reveal, api_url, reveal_uni_id, reveal_number, reveal_nonce,
+                        )
                         if status:
                             st.success(f"✅ Server Response ({status}): {response}")
                             st.balloons()
                         else:
                             st.error(f"❌ Error: {response}")
 
-        st.markdown('</div>', unsafe_allow_html=True)
-
     with cols[1]:
-        st.markdown('<div class="phase-card">', unsafe_allow_html=True)
-        st.subheader("Reveal Checklist")
-        st.write("• Ensure exact match with commit (number & nonce).")
-        st.write("• If you lose the nonce, reveal is impossible.")
-        st.write("• Use the preview hash to verify before submitting.")
-        st.markdown('</div>', unsafe_allow_html=True)
+        with st.container(border=True):
+            st.subheader("Reveal Checklist")
+            st.write("• Ensure exact match with commit (number & nonce).")
+            st.write("• If you lose the nonce, reveal is impossible.")
+            st.write("• Use the preview hash to verify before submitting.")
 
 # TAB 3 - Leaderboard / Results
 with tab3:
@@ -285,28 +411,18 @@ with tab3:
     top_cols = st.columns([2, 1])
     with top_cols[0]:
         st.subheader("Commit / Reveal Data")
-        action_cols = st.columns(3)
-        if action_cols[0].button("🔄 Refresh Commits"):
-            commits_url = f"{api_url}?table=commits"
-            commits = get_csv_data(commits_url)
-            if commits:
-                df_commits = pd.DataFrame(commits)
-                st.session_state["latest_commits"] = df_commits
-                st.success(f"Loaded {len(df_commits)} commits")
-            else:
-                st.info("No commits found")
-        if action_cols[1].button("🔄 Refresh Reveals"):
-            reveals_url = f"{api_url}?table=reveals"
-            reveals = get_csv_data(reveals_url)
-            if reveals:
-                df_reveals = pd.DataFrame(reveals)
-                st.session_state["latest_reveals"] = df_reveals
-                st.success(f"Loaded {len(df_reveals)} reveals")
+        action_cols = st.columns(2)
+        if action_cols[0].button("🔄 Refresh"):
+            commits, reveals = fetch_tables(api_url)
+            st.session_state["latest_commits"] = commits
+            set_latest_reveals(reveals)
+            if commits.empty and reveals.empty:
+                st.info("No commits or reveals found")
             else:
-                st.info("No reveals found")
-        if action_cols[2].button("📥 Clear Session Data"):
+                st.success(f"Loaded {len(commits)} commits and {len(reveals)} reveals")
+        if action_cols[1].button("📥 Clear Session Data"):
             st.session_state["latest_commits"] = pd.DataFrame()
-            st.session_state["latest_reveals"] = pd.DataFrame()
+            set_latest_reveals(pd.DataFrame())
             st.info("Cleared session-stored commit/reveal tables")
 
         # Show commits / reveals if present
@@ -320,72 +436,51 @@ with tab3:
     with top_cols[1]:
         st.subheader("Quick Stats")
         if not st.session_state["latest_reveals"].empty:
-            df = st.session_state["latest_reveals"].copy()
-            df["number_int"] = pd.to_numeric(df.get("number", pd.Series()), errors="coerce")
-            valid_numbers = df["number_int"].dropna().astype(int).tolist()
-            if valid_numbers:
-                avg = mean(valid_numbers)
-                target = K_FACTOR * avg
-                st.metric("Participants (reveals)", len(valid_numbers))
-                st.metric("Average", f"{avg:.2f}")
-                st.metric("Target (2/3 × avg)", f"{target:.2f}")
+            parsed = st.session_state["parsed_reveals"]
+            if parsed.avg is not None:
+                st.metric("Participants (reveals)", len(parsed.df))
+                st.metric("Average", f"{parsed.avg:.2f}")
+                st.metric("Target (2/3 × avg)", f"{parsed.target:.2f}")
             else:
                 st.write("No valid numeric reveals yet.")
         else:
-            st.write("Refresh reveals to view stats.")
+            st.write("Refresh to view stats.")
 
     st.markdown("---")
 
     # distribution chart
     if not st.session_state["latest_reveals"].empty:
-        df = st.session_state["latest_reveals"].copy()
-        df["number_int"] = pd.to_numeric(df.get("number", pd.Series()), errors="coerce")
-        counts = df["number_int"].dropna().astype(int).value_counts().sort_index()
+        counts = st.session_state["parsed_reveals"].counts
         if not counts.empty:
             st.subheader("Reveal Distribution")
             st.bar_chart(counts)
 
     # Calculate winners
     st.markdown("")
+    if st.button("♻️ Force refresh", help="Drop the 30 s table cache so the next fetch hits the API"):
+        _get_csv_data_cached.clear()
+        st.info("Table cache cleared")
     if st.button("🏆 Calculate Winners", type="primary"):
         with st.spinner("Calculating results..."):
-            commits_data = get_csv_data(f"{api_url}?table=commits")
             reveals_data = get_csv_data(f"{api_url}?table=reveals")
 
-            if not reveals_data:
+            if reveals_data.empty:
                 st.warning("No reveals available to calculate winners")
             else:
-                valid_numbers = []
-                parsed = []
-                for reveal in reveals_data:
-                    try:
-                        num = int(reveal.get("number", ""))
-                        if 0 <= num <= 100:
-                            valid_numbers.append(num)
-                            parsed.append({"uni_id": reveal.get("uni_id", ""), "number": num, "nonce": reveal.get("nonce", "")})
-                    except:
-                        continue
-
-                if valid_numbers:
-                    avg = mean(valid_numbers)
-                    target = K_FACTOR * avg
+                ranked, avg, target = compute_winners(reveals_data)
+
+                if not ranked.empty:
                     st.success("✅ Results ready")
                     c1, c2, c3 = st.columns(3)
-                    c1.metric("Participants", len(valid_numbers))
+                    c1.metric("Participants", len(ranked))
                     c2.metric("Average", f"{avg:.2f}")
                     c3.metric("Target (2/3 × avg)", f"{target:.2f}")
 
-                    results_df = pd.DataFrame(parsed)
-                    results_df["distance"] = (results_df["number"] - target).abs()
-                    results_df = results_df.sort_values("distance").reset_index(drop=True)
-                    results_df.index += 1
-                    results_df.index.name = "Rank"
-
                     st.subheader("Top 10 Closest")
-                    st.table(results_df.head(10)[["number", "distance", "uni_id"]])
+                    st.table(ranked.head(10)[["number", "distance", "uni_id"]])
 
-                    st.markdown("Full results (sorted by closeness):")
-                    st.dataframe(results_df, use_container_width=True)
+                    with st.expander("Full ranked results"):
+                        st.dataframe(ranked, use_container_width=True)
                 else:
                     st.warning("No valid numeric reveals found to compute results.")
 
@@ -5,10 +5,12 @@ Run with: streamlit run app.py
 import streamlit as st
 import hashlib
 import requests
-import csv
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import io
 from datetime import datetime, timezone
-from statistics import mean
+import numpy as np
 import pandas as pd
 
 # Configuration (UNCHANGED)
@@ -18,8 +20,14 @@ REVEAL_OPEN_UTC = datetime(2025, 10, 21, 22, 0, 0, tzinfo=timezone.utc)
 K_FACTOR = 2/3
 
 # Helper Functions
-def sha256(s: str) -> str:
-    return hashlib.sha256(s.encode("utf-8")).hexdigest()
+_sha256_ctor = hashlib.sha256
+
+def preimage_bytes(uni: str, number: int, nonce: str) -> bytes:
+    """The "uni|number|nonce" preimage assembled straight from the encoded parts."""
+    return b"|".join((uni.encode("utf-8"), str(int(number)).encode("ascii"), nonce.encode("utf-8")))
+
+def sha256(uni: str, number: int, nonce: str) -> str:
+    return _sha256_ctor(preimage_bytes(uni, number, nonce)).hexdigest()
 
 def now_utc():
     return datetime.now(timezone.utc)
@@ -27,6 +35,9 @@ def now_utc():
 def format_dt(dt: datetime):
     return dt.strftime("%Y-%m-%d %H:%M:%S UTC")
 
+COMMIT_DEADLINE_STR = format_dt(COMMIT_DEADLINE_UTC)
+REVEAL_OPEN_STR = format_dt(REVEAL_OPEN_UTC)
+
 def time_delta_str(future_dt: datetime):
     delta = future_dt - now_utc()
     seconds = int(delta.total_seconds())
@@ -46,19 +57,48 @@ def time_delta_str(future_dt: datetime):
         parts.append(f"{seconds}s")
     return " ".join(parts)
 
-def get_csv_data(url: str):
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Keep-alive session shared across reruns, so GETs and POSTs reuse warm TLS connections."""
+    s = requests.Session()
+    s.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+    return s
+
+@st.cache_data(ttl=15, show_spinner=False)
+def _get_csv_df_cached(url: str) -> pd.DataFrame:
+    """The CSV at url as an all-string DataFrame, cached for 15 s; raises on
+    failure so errors aren't cached."""
+    r = get_session().get(url, timeout=20)
+    r.raise_for_status()
+    try:
+        return pd.read_csv(io.StringIO(r.text), dtype=str, keep_default_na=False)
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame()
+
+def get_csv_df(url: str) -> pd.DataFrame:
     try:
-        r = requests.get(url, timeout=20)
-        r.raise_for_status()
-        return list(csv.DictReader(io.StringIO(r.text)))
+        return _get_csv_df_cached(url)
     except Exception as e:
         st.error(f"Error fetching data: {e}")
-        return []
+        return pd.DataFrame()
+
+def fetch_tables(api_url):
+    """Fetch the commits and reveals tables concurrently; returns (commits, reveals).
+
+    Workers get this run's script context so st.error in get_csv_df still works."""
+    with ThreadPoolExecutor(
+        max_workers=2,
+        initializer=add_script_run_ctx,
+        initargs=(None, get_script_run_ctx()),
+    ) as ex:
+        f_c = ex.submit(get_csv_df, f"{api_url}?table=commits")
+        f_r = ex.submit(get_csv_df, f"{api_url}?table=reveals")
+        return f_c.result(), f_r.result()
 
 def send_commit(api_url, uni_id, commit_hash):
     payload = {"kind": "commit", "uni_id": uni_id, "commit": commit_hash}
     try:
-        r = requests.post(api_url, json=payload, timeout=15)
+        r = get_session().post(api_url, json=payload, timeout=15)
         return r.status_code, r.text
     except Exception as e:
         return None, str(e)
@@ -66,20 +106,60 @@ def send_commit(api_url, uni_id, commit_hash):
 def send_reveal(api_url, uni_id, number, nonce):
     payload = {"kind": "reveal", "uni_id": uni_id, "number": number, "nonce": nonce}
     try:
-        r = requests.post(api_url, json=payload, timeout=15)
+        r = get_session().post(api_url, json=payload, timeout=15)
         return r.status_code, r.text
     except Exception as e:
         return None, str(e)
 
+def _submit_commit_callback(api_url, commit_open):
+    """Send the last generated commitment; runs once per click.
+
+    commit_inflight drops clicks while a POST is still running, and
+    commit_submitted_hash keeps a hash the server already accepted from being
+    sent again by a double click queued behind it."""
+    commit_hash = st.session_state["last_commit_hash"]
+    if not commit_hash:
+        st.session_state["commit_response"] = (None, "Generate a commit hash first")
+        return
+    if not commit_open:
+        st.session_state["commit_response"] = (None, "Commit window is closed. Cannot submit.")
+        return
+    if st.session_state.get("commit_inflight") or st.session_state.get("commit_submitted_hash") == commit_hash:
+        return
+    st.session_state["commit_inflight"] = True
+    try:
+        status, response = send_commit(api_url, st.session_state["last_commit_uni"], commit_hash)
+    finally:
+        st.session_state["commit_inflight"] = False
+    st.session_state["commit_response"] = (status, response)
+    if status is not None and status < 400:
+        st.session_state["commit_submitted_hash"] = commit_hash
+
+def _parse_numbers(df: pd.DataFrame) -> np.ndarray:
+    """Revealed integer numbers within 0..100 as int16, filtered like Calculate
+    Winners; the checks run before the cast so values can't wrap or truncate."""
+    if "number" not in df:
+        return np.empty(0, dtype=np.int16)
+    raw = df["number"].astype(str)
+    nums = pd.to_numeric(raw.where(raw.str.fullmatch(r"\s*[+-]?\d+\s*", na=False)), errors="coerce")
+    return nums[nums.between(0, 100)].to_numpy().astype(np.int16)
+
+def set_latest_reveals(df: pd.DataFrame):
+    """Store the reveals table and its parsed numbers, parsed once per refresh."""
+    st.session_state["latest_reveals"] = df
+    st.session_state["reveals_nums"] = _parse_numbers(df)
+
 # Session state
 if "last_commit_hash" not in st.session_state:
     st.session_state["last_commit_hash"] = ""
 if "last_preimage" not in st.session_state:
-    st.session_state["last_preimage"] = ""
+    st.session_state["last_preimage"] = b""
+if "last_commit_uni" not in st.session_state:
+    st.session_state["last_commit_uni"] = ""
 if "latest_commits" not in st.session_state:
     st.session_state["latest_commits"] = pd.DataFrame()
-if "latest_reveals" not in st.session_state:
-    st.session_state["latest_reveals"] = pd.DataFrame()
+if "reveals_nums" not in st.session_state:
+    set_latest_reveals(pd.DataFrame())
 
 # Page config
 st.set_page_config(page_title="Beauty Contest Game", page_icon="🎯", layout="wide")
@@ -189,8 +269,8 @@ with st.sidebar:
     reveal_open = current_time >= REVEAL_OPEN_UTC
 
     st.subheader("⏰ Timeline")
-    st.write(f"Commit deadline: **{format_dt(COMMIT_DEADLINE_UTC)}**")
-    st.write(f"Reveal opens: **{format_dt(REVEAL_OPEN_UTC)}**")
+    st.write(f"Commit deadline: **{COMMIT_DEADLINE_STR}**")
+    st.write(f"Reveal opens: **{REVEAL_OPEN_STR}**")
     st.write("")
     if commit_open:
         st.success(f"Commits OPEN — closes in {time_delta_str(COMMIT_DEADLINE_UTC)}")
@@ -226,10 +306,7 @@ with left_col:
             nonce = st.text_input("Secret Nonce", type="password", help="Keep this secret", key="commit_nonce")
             nonce_confirm = st.text_input("Confirm Nonce", type="password", key="commit_nonce_confirm")
 
-            cols_btn = st.columns([1,1,1])
-            gen = cols_btn[0].form_submit_button("✨ Generate", help="Generate commitment hash")
-            download_pre = cols_btn[1].button("📥 Download last preimage")
-            submit_server_btn = cols_btn[2].button("📤 Submit to Server")
+            gen = st.form_submit_button("✨ Generate", help="Generate commitment hash")
 
             if gen:
                 if not uni_id or not nonce:
@@ -237,46 +314,50 @@ with left_col:
                 elif nonce != nonce_confirm:
                     st.error("❌ Nonces don't match")
                 else:
-                    preimage = f"{uni_id}|{number}|{nonce}"
-                    commit_hash = sha256(preimage)
+                    # Kept as bytes; only decoded for display, so the download needs no re-encode
+                    preimage = preimage_bytes(uni_id, number, nonce)
+                    commit_hash = _sha256_ctor(preimage).hexdigest()
                     st.session_state["last_preimage"] = preimage
                     st.session_state["last_commit_hash"] = commit_hash
+                    st.session_state["last_commit_uni"] = uni_id
+                    st.session_state.pop("commit_response", None)
                     st.success("✅ Commitment generated")
 
-            # Glass-themed code display for commit hash / preimage
-            if st.session_state.get("last_commit_hash"):
-                commit_hash = st.session_state["last_commit_hash"]
-                st.markdown('<div style="margin-top:10px">Commit Hash</div>', unsafe_allow_html=True)
-                st.markdown(f'<div class="glass-code"><pre>{commit_hash}</pre></div>', unsafe_allow_html=True)
-
-                # interactive icon buttons (copy simulation + download)
-                btn_c1, btn_c2 = st.columns([1,1])
-                if btn_c1.button("📋 Copy Hash"):
-                    # simulate copy: place into a temporary text area and prompt user
-                    st.success("Hash copied to clipboard buffer (Press Ctrl/C to copy from the textbox below)")
-                    st.text_area("Hash clipboard buffer (select to copy)", value=commit_hash, height=80, key="hash_clip")
-                if btn_c2.button("📥 Download Hash"):
-                    st.download_button("Download commit hash", commit_hash, file_name=f"commit_{uni_id}.txt")
-
-                with st.expander("Preimage (KEEP SAFE)"):
-                    if st.session_state.get("last_preimage"):
-                        pre = st.session_state["last_preimage"]
-                        st.markdown(f'<div class="glass-code"><pre>{pre}</pre></div>', unsafe_allow_html=True)
-                        st.download_button("⬇️ Download Preimage", pre, file_name=f"preimage_{uni_id}.txt")
-
-            # submit to server after generating
-            if submit_server_btn:
-                if not st.session_state.get("last_commit_hash"):
-                    st.error("Generate a commit hash first")
-                elif not commit_open:
-                    st.error("Commit window is closed. Cannot submit.")
-                else:
-                    with st.spinner("Submitting commit..."):
-                        status, response = send_commit(api_url, uni_id, st.session_state["last_commit_hash"])
-                        if status:
-                            st.success(f"✅ Server Response ({status}): {response}")
-                        else:
-                            st.error(f"❌ Error: {response}")
+        # Glass-themed code display for commit hash / preimage. Rendered outside
+        # the form: plain and download buttons aren't allowed inside one.
+        if st.session_state["last_commit_hash"]:
+            commit_hash = st.session_state["last_commit_hash"]
+            commit_uni = st.session_state["last_commit_uni"]
+            st.markdown('<div style="margin-top:10px">Commit Hash</div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="glass-code"><pre>{commit_hash}</pre></div>', unsafe_allow_html=True)
+
+            # interactive icon buttons (copy simulation + download)
+            btn_c1, btn_c2 = st.columns([1,1])
+            if btn_c1.button("📋 Copy Hash"):
+                # simulate copy: place into a temporary text area and prompt user
+                st.success("Hash copied to clipboard buffer (Press Ctrl/C to copy from the textbox below)")
+                st.text_area("Hash clipboard buffer (select to copy)", value=commit_hash, height=80, key="hash_clip")
+            btn_c2.download_button("📥 Download Hash", commit_hash, file_name=f"commit_{commit_uni}.txt")
+
+            with st.expander("Preimage (KEEP SAFE)"):
+                if st.session_state.get("last_preimage"):
+                    pre = st.session_state["last_preimage"]
+                    st.markdown(f'<div class="glass-code"><pre>{pre.decode("utf-8")}</pre></div>', unsafe_allow_html=True)
+                    st.download_button("⬇️ Download Preimage", pre, file_name=f"preimage_{commit_uni}.txt")
+
+        # submit to server after generating
+        already_submitted = bool(st.session_state["last_commit_hash"]) and \
+            st.session_state.get("commit_submitted_hash") == st.session_state["last_commit_hash"]
+        st.button("📤 Submit to Server", on_click=_submit_commit_callback, args=(api_url, commit_open),
+                  disabled=already_submitted or st.session_state.get("commit_inflight", False))
+        if already_submitted:
+            st.info("Already submitted.")
+        if "commit_response" in st.session_state:
+            status, response = st.session_state["commit_response"]
+            if status:
+                st.success(f"✅ Server Response ({status}): {response}")
+            else:
+                st.error(f"❌ Error: {response}")
 
         st.markdown('</div>', unsafe_allow_html=True)
 
@@ -296,8 +377,7 @@ with left_col:
 
             preview = st.checkbox("Preview computed hash from input")
             if preview and r_uni and r_nonce is not None:
-                check_preimage = f"{r_uni}|{r_num}|{r_nonce}"
-                check_hash = sha256(check_preimage)
+                check_hash = sha256(r_uni, r_num, r_nonce)
                 st.markdown('<div class="tip">', unsafe_allow_html=True)
                 st.write("Computed hash from your reveal inputs:")
                 st.code(check_hash, language=None)
@@ -344,9 +424,10 @@ with left_col:
         df = st.session_state["latest_reveals"].copy()
         df["number_int"] = pd.to_numeric(df.get("number", pd.Series()), errors="coerce")
         df = df.dropna(subset=["number_int"])
-        df["distance_preview"] = (df["number_int"] - (K_FACTOR * df["number_int"].mean())).abs()
-        df = df.sort_values("distance_preview")
-        st.table(df.head(5)[["uni_id", "number", "distance_preview"]].rename(columns={"distance_preview":"dist"}))
+        preview_target = K_FACTOR * df["number_int"].mean()
+        df["distance_preview"] = (df["number_int"] - preview_target).abs()
+        top = df.nsmallest(5, "distance_preview")
+        st.table(top[["uni_id", "number", "distance_preview"]].rename(columns={"distance_preview":"dist"}))
     else:
         st.write("Refresh reveals on the right to populate.")
     st.markdown('</div>', unsafe_allow_html=True)
@@ -357,9 +438,8 @@ with right_col:
     st.subheader("Live Controls")
     if st.button("🔄 Refresh Commits"):
         commits_url = f"{api_url}?table=commits"
-        commits = get_csv_data(commits_url)
-        if commits:
-            df_commits = pd.DataFrame(commits)
+        df_commits = get_csv_df(commits_url)
+        if not df_commits.empty:
             st.session_state["latest_commits"] = df_commits
             st.success(f"Loaded {len(df_commits)} commits")
         else:
@@ -367,14 +447,23 @@ with right_col:
 
     if st.button("🔄 Refresh Reveals"):
         reveals_url = f"{api_url}?table=reveals"
-        reveals = get_csv_data(reveals_url)
-        if reveals:
-            df_reveals = pd.DataFrame(reveals)
-            st.session_state["latest_reveals"] = df_reveals
+        df_reveals = get_csv_df(reveals_url)
+        if not df_reveals.empty:
+            set_latest_reveals(df_reveals)
             st.success(f"Loaded {len(df_reveals)} reveals")
         else:
             st.info("No reveals found")
 
+    if st.button("🔄 Refresh All"):
+        df_commits, df_reveals = fetch_tables(api_url)
+        st.session_state["latest_commits"] = df_commits
+        set_latest_reveals(df_reveals)
+        st.success(f"Loaded {len(df_commits)} commits and {len(df_reveals)} reveals")
+
+    if st.button("♻️ Force refresh", help="Drop the 15 s table cache so the next refresh hits the API"):
+        _get_csv_df_cached.clear()
+        st.info("Table cache cleared")
+
     if st.button("📥 Export Reveals CSV"):
         if not st.session_state["latest_reveals"].empty:
             csv_data = st.session_state["latest_reveals"].to_csv(index=False)
@@ -385,18 +474,17 @@ with right_col:
     st.markdown("---")
     st.subheader("Stats")
     if not st.session_state["latest_reveals"].empty:
-        df = st.session_state["latest_reveals"].copy()
-        df["number_int"] = pd.to_numeric(df.get("number", pd.Series()), errors="coerce")
-        valid_numbers = df["number_int"].dropna().astype(int).tolist()
-        if valid_numbers:
-            avg = mean(valid_numbers)
+        arr = st.session_state["reveals_nums"]
+        if arr.size:
+            avg = float(arr.mean())
             target = K_FACTOR * avg
-            st.metric("Participants (revealed)", len(valid_numbers))
+            st.metric("Participants (revealed)", arr.size)
             st.metric("Average", f"{avg:.2f}")
             st.metric("Target (2/3 × avg)", f"{target:.2f}")
             if st.button("📈 Show Distribution Chart"):
-                counts = pd.Series(valid_numbers).value_counts().sort_index()
-                st.bar_chart(counts)
+                # Numbers are already bounded to 0..100, so one linear bincount pass gives sorted counts
+                counts = np.bincount(arr, minlength=101)
+                st.bar_chart(pd.Series(counts, index=np.arange(101)))
     else:
         st.write("Refresh reveals to show stats.")
 
@@ -409,35 +497,34 @@ st.header("📊 Results & Calculation")
 
 if st.button("🏆 Calculate Winners"):
     with st.spinner("Calculating results..."):
-        commits_data = get_csv_data(f"{api_url}?table=commits")
-        reveals_data = get_csv_data(f"{api_url}?table=reveals")
+        reveals_data = get_csv_df(f"{api_url}?table=reveals")
 
-        if not reveals_data:
+        if reveals_data.empty:
             st.warning("No reveals available to calculate winners")
         else:
-            valid_numbers = []
-            parsed = []
-            for reveal in reveals_data:
-                try:
-                    num = int(reveal.get("number", ""))
-                    if 0 <= num <= 100:
-                        valid_numbers.append(num)
-                        parsed.append({"uni_id": reveal.get("uni_id", ""), "number": num, "nonce": reveal.get("nonce", "")})
-                except:
-                    continue
-
-            if valid_numbers:
-                avg = mean(valid_numbers)
+            results_df = reveals_data.reindex(columns=["uni_id", "number", "nonce"]).fillna("")
+            raw = results_df["number"].astype(str)
+            # Integer literals only, as int() takes them: "5.0" and "1e1" don't count
+            is_int = raw.str.fullmatch(r"\s*[+-]?\d+\s*", na=False)
+            results_df["number"] = pd.to_numeric(raw.where(is_int), errors="coerce")
+            results_df = results_df[results_df["number"].between(0, 100)]
+            # Range check first so the int16 cast can't wrap
+            results_df = results_df.astype({"number": np.int16})
+
+            if not results_df.empty:
+                avg = float(results_df["number"].to_numpy().mean())
                 target = K_FACTOR * avg
                 st.success("✅ Results ready")
                 c1, c2, c3 = st.columns(3)
-                c1.metric("Participants", len(valid_numbers))
+                c1.metric("Participants", len(results_df))
                 c2.metric("Average", f"{avg:.2f}")
                 c3.metric("Target (2/3 × avg)", f"{target:.2f}")
 
-                results_df = pd.DataFrame(parsed)
-                results_df["distance"] = (results_df["number"] - target).abs()
-                results_df = results_df.sort_values("distance").reset_index(drop=True)
+                # Rank on float64 distances so near-ties stay distinct
+                results_df["distance"] = np.abs(results_df["number"].to_numpy(np.float64) - target)
+                # One stable sort feeds both the top 10 and the full table
+                results_df = results_df.sort_values("distance", kind="stable").reset_index(drop=True)
+                results_df["distance"] = results_df["distance"].astype(np.float32)  # display only
                 results_df.index += 1
                 results_df.index.name = "Rank"
 
@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import datetime
 
 # ---------------------------------------------------
 # PAGE CONFIG
@@ -11,6 +10,31 @@ st.set_page_config(
     layout="wide"
 )
 
+# ---------------------------------------------------
+# MOCK DATA (static, so built once and cached)
+# ---------------------------------------------------
+@st.cache_data
+def _recent_transfers():
+    return pd.DataFrame({
+        "Date": ["2025-01-03", "2025-01-02", "2025-01-01"],
+        "Type": ["Sent", "Received", "Sent"],
+        "Amount": ["$350", "$420", "$150"],
+        "Country": ["Canada", "UK", "Japan"],
+        "Status": ["Completed", "Completed", "Completed"]
+    })
+
+
+@st.cache_data
+def _history():
+    return pd.DataFrame({
+        "Date": ["2025-01-05", "2025-01-02", "2024-12-29", "2024-12-27"],
+        "Type": ["Received", "Sent", "Sent", "Received"],
+        "Amount": ["$500", "$300", "$200", "$650"],
+        "Country": ["USA", "India", "Japan", "Germany"],
+        "Status": ["Completed", "Completed", "Completed", "Completed"]
+    })
+
+
 # ---------------------------------------------------
 # SIDEBAR
 # ---------------------------------------------------
@@ -43,15 +67,7 @@ if page == "Dashboard":
 
     st.markdown("### Recent Transfers")
 
-    data = {
-        "Date": ["2025-01-03", "2025-01-02", "2025-01-01"],
-        "Type": ["Sent", "Received", "Sent"],
-        "Amount": ["$350", "$420", "$150"],
-        "Country": ["Canada", "UK", "Japan"],
-        "Status": ["Completed", "Completed", "Completed"]
-    }
-
-    st.dataframe(pd.DataFrame(data), use_container_width=True)
+    st.dataframe(_recent_transfers(), use_container_width=True)
 
 
 # ---------------------------------------------------
@@ -112,15 +128,7 @@ if page == "Receive Money":
 if page == "Transaction History":
     st.title("📜 Transaction History")
 
-    history = pd.DataFrame({
-        "Date": ["2025-01-05", "2025-01-02", "2024-12-29", "2024-12-27"],
-        "Type": ["Received", "Sent", "Sent", "Received"],
-        "Amount": ["$500", "$300", "$200", "$650"],
-        "Country": ["USA", "India", "Japan", "Germany"],
-        "Status": ["Completed", "Completed", "Completed", "Completed"]
-    })
-
-    st.dataframe(history, use_container_width=True)
+    st.dataframe(_history(), use_container_width=True)
 
     st.markdown("---")
     st.caption("This is a simulated dashboard for project use only.")
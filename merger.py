@@ -6,7 +6,6 @@ import csv
 import io
 import hashlib
 import requests
-from statistics import mean
 from datetime import datetime
 from typing import Dict, Any, List, Tuple, Optional
 
@@ -151,7 +150,7 @@ def merge_from_api(base: str) -> Dict[str, Any]:
     valid: List[Tuple[str, int]] = [(r["uni_id"], int(r["number"])) for r in verified_rows
              if r["verified"] == "True" and r["number"] != ""]
     if valid:
-        avg_val = mean(n for _, n in valid)
+        avg_val = sum(n for _, n in valid) / len(valid)
         target = K_FACTOR * avg_val
         distances = [(uid, n, abs(n - target)) for uid, n in valid]
         min_dist = min(d for _, _, d in distances)
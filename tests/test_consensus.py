@@ -0,0 +1,59 @@
+import hashlib
+import http.server
+import pathlib
+import threading
+import unittest
+
+from streamlit.testing.v1 import AppTest
+
+APP = str(pathlib.Path(__file__).resolve().parent.parent / "App (1).py")
+
+
+def _commit(uni_id, number, nonce):
+    return hashlib.sha256("{}|{}|{}".format(uni_id, number, nonce).encode("utf-8")).hexdigest()
+
+
+class ConsensusTest(unittest.TestCase):
+    REVEALS = [("a", "10", "x"), ("b", "50", "y"), ("big", "99999999999999999999", "z")]
+
+    def setUp(self):
+        commits = "timestamp_utc,uni_id,commit\n" + "".join(
+            "2025-10-21T10:00:00Z,{},{}\n".format(u, _commit(u, n, o)) for u, n, o in self.REVEALS
+        )
+        reveals = "timestamp_utc,uni_id,number,nonce\n" + "".join(
+            "2025-10-21T23:00:00Z,{},{},{}\n".format(u, n, o) for u, n, o in self.REVEALS
+        )
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = (reveals if "table=reveals" in self.path else commits).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_oversized_number_is_out_of_range(self):
+        at = AppTest.from_file(APP, default_timeout=30).run()
+        at.text_input[0].set_value("http://127.0.0.1:{}/api".format(self.server.server_port))
+        next(b for b in at.button if "Consensus" in b.label).click().run()
+        self.assertFalse(at.exception)
+
+        leaderboard = at.dataframe[0].value.set_index("uni_id")
+        self.assertEqual(leaderboard.loc["big", "reason"], "out_of_range")
+        self.assertEqual(leaderboard.loc["big", "number"], "99999999999999999999")
+        self.assertEqual(leaderboard.loc["a", "reason"], "ok")
+        self.assertEqual(leaderboard.loc["b", "reason"], "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()